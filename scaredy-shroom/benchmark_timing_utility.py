@@ -0,0 +1,72 @@
+"""Benchmark timing wave generation.
+
+@author: SilentCA
+@email: 2291948161@qq.com
+
+Compare `timing_utility.generate_timing_wave` with the former per-segment
+`np.full` + `np.concatenate` implementation.
+
+    python benchmark_timing_utility.py
+"""
+
+import timeit
+
+import numpy as np
+
+import timing_utility
+
+
+def generate_timing_wave_legacy(timing_sequence_list, sample_rate, bit_num=8, n_channel=1):
+    """Former implementation, kept as reference for the benchmark."""
+    dtype = np.uint8 if bit_num < 9 else np.uint16
+    if n_channel == 1:
+        timing_wave = np.concatenate(
+            [np.full(round(t[1] * sample_rate), t[0], dtype=dtype) for t in timing_sequence_list]
+        )
+    else:
+        timing_wave_list = []
+        for idx in range(n_channel):
+            timing_wave_single_channel = np.concatenate(
+                [np.full(round(t[1] * sample_rate), (t[0] >> bit_num*idx) & 0xFF, dtype=dtype)
+                 for t in timing_sequence_list]
+            )
+            timing_wave_list.append(timing_wave_single_channel)
+        timing_wave = np.vstack(timing_wave_list)
+    return timing_wave
+
+
+def random_timing_sequence_list(n_segments, sample_rate, n_channel, seed=0):
+    """Random sequence of short segments, 1 to 20 samples each."""
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 1 << (8 * n_channel), n_segments)
+    durations = rng.integers(1, 21, n_segments) / sample_rate
+    return [(int(v), float(d)) for v, d in zip(values, durations)]
+
+
+def main(sample_rate=5e6, repeat=5):
+    print('{:>10} {:>9} {:>12} {:>12} {:>9}'.format(
+        'segments', 'channels', 'legacy (ms)', 'new (ms)', 'speedup'))
+    for n_segments in (10, 1000, 100000):
+        for n_channel in (1, 2):
+            timing_sequence_list = random_timing_sequence_list(n_segments, sample_rate, n_channel)
+            if n_channel == 1:
+                timing_sequence_list = [(v & 0xFF, d) for v, d in timing_sequence_list]
+            legacy = generate_timing_wave_legacy(timing_sequence_list, sample_rate, n_channel=n_channel)
+            new = timing_utility.generate_timing_wave(timing_sequence_list, sample_rate,
+                                                      n_channel=n_channel)
+            assert np.array_equal(legacy, new)
+            number = max(1, 10000 // n_segments)
+            t_legacy = min(timeit.repeat(
+                lambda: generate_timing_wave_legacy(timing_sequence_list, sample_rate,
+                                                    n_channel=n_channel),
+                number=number, repeat=repeat)) / number
+            t_new = min(timeit.repeat(
+                lambda: timing_utility.generate_timing_wave(timing_sequence_list, sample_rate,
+                                                            n_channel=n_channel),
+                number=number, repeat=repeat)) / number
+            print('{:>10} {:>9} {:>12.3f} {:>12.3f} {:>8.1f}x'.format(
+                n_segments, n_channel, t_legacy * 1e3, t_new * 1e3, t_legacy / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Check that importing timing_utility stays light.
+
+@author: SilentCA
+@email: 2291948161@qq.com
+
+Import `timing_utility` in a fresh interpreter and fail if matplotlib or
+nidaqmx got loaded, or if the import took longer than the time budget in
+seconds, 1 by default.
+
+    python check_import_time.py [budget]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+FORBIDDEN_MODULES = ('matplotlib', 'nidaqmx')
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import timing_utility
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+
+def measure_import():
+    """Import timing_utility in a fresh interpreter.
+
+    Returns
+    -------
+    elapsed : float
+        Import time in seconds.
+    modules : list of str
+        Modules loaded after the import.
+    """
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output)
+    return result['elapsed'], result['modules']
+
+
+def main(budget=1.0):
+    elapsed, modules = measure_import()
+    print('import timing_utility: {:.3f} s, {} modules loaded'.format(elapsed, len(modules)))
+    failures = []
+    for name in FORBIDDEN_MODULES:
+        loaded = [module for module in modules if module == name or module.startswith(name + '.')]
+        if loaded:
+            failures.append('{} is imported ({} modules)'.format(name, len(loaded)))
+    if elapsed > budget:
+        failures.append('import took {:.3f} s, budget is {:.3f} s'.format(elapsed, budget))
+    for failure in failures:
+        print('FAIL: ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*map(float, sys.argv[1:2])))
@@ -5,6 +5,8 @@
 """
 
 
+import os
+
 import timing_utility
 import ni_devices_utilities
 import numpy as np
@@ -16,11 +18,16 @@ timing_sequence_list = [
     (0x00FF, 1),
     (0xFF00, 1)
 ]
-timing_rate = 5e6      # Uint: Hz
+timing_timebase = 80e6  # Unit: Hz, chassis onboard clock the DO sample clock is divided from
 sample_time = 10       # Unit: second
 sample_rate = 50e3     # Unit: Hz
-# Experimental data save path
+sample_chunk_time = 0.1  # Unit: second, data is written to disk chunk by chunk
+# Experimental data save path, data is saved in volts as float64
 data_file_path = r'C:\Data\data.npy'
+# Save raw int16 codes instead, a quarter of the size, to `<name>_raw.npy` with
+# the scaling coefficients in `<name>_raw_scaling.npy`, load it in volts with
+# ni_devices_utilities.load_scaled_data
+sample_raw = False
 
 timing_channel = ['/cDAQ9189-1EFE359Mod3/port0', '/cDAQ9189-1EFE359Mod4/port0']
 sample_channel = 'cDAQ9189-1EFE359Mod1/ai0'
@@ -30,18 +37,31 @@ sample_trigger = '/cDAQ9189-1EFE359/PFI0'
 
 # ------------- Configure devices ------------------
 # configure timing
-timing_wave = timing_utility.generate_timing_wave(
+# use the lowest sample clock rate representing every edge exactly
+timing_wave, timing_rate = timing_utility.plan_timing_wave(
         timing_sequence_list,
-        timing_rate, n_channel=2)
+        timebase=timing_timebase, n_channel=2)
 timing_task = ni_devices_utilities.cfg_DO_task(
         channel=timing_channel,
         rate=timing_rate)
 ni_devices_utilities.write_digital_data(timing_task, timing_wave, multi_channel=True)
 
-# configure sample
-sample_task, data_buffer = ni_devices_utilities.cfg_AI_task(
-        sample_time, channel=sample_channel,
-        rate=sample_rate, trigger=sample_trigger
+# configure sample, streaming data to disk as it arrives
+sample_chunk_samples = int(sample_chunk_time * sample_rate)
+sample_task, ring_buffer = ni_devices_utilities.cfg_continuous_AI_task(
+        sample_chunk_samples, channel=sample_channel,
+        rate=sample_rate, trigger=sample_trigger, raw=sample_raw
+)
+if sample_raw:
+    # distinct name, so that readers expecting volts in data_file_path fail
+    root, ext = os.path.splitext(data_file_path)
+    data_file_path = root + '_raw' + ext
+    ni_devices_utilities.save_scaling_coefficients(
+            data_file_path, ni_devices_utilities.get_scaling_coefficients(sample_task))
+data_writer = ni_devices_utilities.NpyStreamWriter(data_file_path)
+acquisition = ni_devices_utilities.ContinuousAcquisition(
+        sample_task, ring_buffer, consumers=[data_writer],
+        max_chunks=int(np.ceil(sample_time / sample_chunk_time))
 )
 
 # ------------- Start timing loop ------------------
@@ -49,14 +69,15 @@ timing_task.start()
 
 
 # ------------- Sample data ------------------------
-sample_task.start()
-data = ni_devices_utilities.read_data(sample_task, data_buffer)
+acquisition.start()
+acquisition.wait()
 
 # ------------- Release resources ------------------
-sample_task.stop()
-sample_task.close()
+acquisition.stop()
+acquisition.close()
 timing_task.stop()
 timing_task.close()
 
 # ------------- Save data --------------------------
-np.save(data_file_path, data)
+# data is already on disk
+data_writer.close()
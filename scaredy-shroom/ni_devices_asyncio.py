@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""asyncio counterparts of the NI device utilities.
+
+@author: SilentCA
+@email: 2291948161@qq.com
+
+Blocking DAQmx calls run in the event loop's default executor and every
+N samples callbacks are bridged into the loop, so several chassis can be
+driven concurrently from one event loop.
+
+Examples:
+    async def shot(timing_wave, timing_rate):
+        ai_task, data = ni_devices_utilities.cfg_AI_task(sample_time, channel=sample_channel)
+        do_task = ni_devices_utilities.cfg_DO_task(
+                channel=timing_channel, rate=timing_rate, n_samples=timing_wave.shape[-1])
+        data, _ = await asyncio.gather(acquire(ai_task, data),
+                                       generate(do_task, timing_wave, multi_channel=True))
+        return data
+"""
+
+import asyncio
+
+import ni_devices_utilities
+
+
+async def acquire(task, data, timeout=None):
+    """Start analog input task and read samples without blocking the event loop.
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A NI-DAQmx analog input task from `cfg_AI_task`, not started.
+    data : numpy.ndarray
+        Buffer from `cfg_AI_task` to hold the requested samples.
+    timeout : float
+        The amount of time in seconds to wait for samples, infinitely if None.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        NumPy array holding the samples requested.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, task.start)
+    try:
+        return await loop.run_in_executor(None, ni_devices_utilities.read_data, task, data, timeout)
+    finally:
+        await loop.run_in_executor(None, task.stop)
+
+
+async def generate(task, data, multi_channel=False, timeout=None):
+    """Write digital data, start digital output task and wait until it is done.
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A finite NI-DAQmx digital output task, e.g. from `cfg_DO_task(n_samples=...)`.
+    data : numpy.ndarray
+        Digital wave, see `write_digital_data`.
+    multi_channel : bool
+        Whether task containing multiple channel.
+    timeout : float
+        The amount of time in seconds to wait for the generation, infinitely if None.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, ni_devices_utilities.write_digital_data,
+                               task, data, multi_channel)
+    await loop.run_in_executor(None, task.start)
+    if timeout is None:
+        timeout = ni_devices_utilities.nidaqmx.constants.WAIT_INFINITELY
+    try:
+        await loop.run_in_executor(None, task.wait_until_done, timeout)
+    finally:
+        await loop.run_in_executor(None, task.stop)
+
+
+async def stream(task, ring_buffer, max_chunks=None, timeout=10.0):
+    """Acquire continuously and yield chunks as they arrive.
+
+    Chunks are read by DAQmx every N samples callbacks, see
+    `ContinuousAcquisition`, and passed to the event loop. The task is
+    started on the first iteration and stopped when iteration ends.
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A continuous NI-DAQmx analog input task from `cfg_continuous_AI_task`.
+    ring_buffer : RingBuffer
+        Ring buffer from `cfg_continuous_AI_task`.
+    max_chunks : int
+        Number of chunks to acquire, until the iteration is left by default.
+    timeout : float
+        The amount of time in seconds to wait for a chunk once notified.
+
+    Yields
+    ------
+    chunk : numpy.ndarray
+        Copy of each chunk. Chunks queue up unbounded while the consumer is slower
+        than the acquisition.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+
+    def put(chunk):
+        # called on the DAQmx thread, the ring buffer slot is reused later
+        loop.call_soon_threadsafe(chunks.put_nowait, chunk.copy())
+
+    acquisition = ni_devices_utilities.ContinuousAcquisition(
+        task, ring_buffer, consumers=[put], timeout=timeout, max_chunks=max_chunks)
+    # the end marker follows the last chunk once acquisition is done or failed
+    done = loop.run_in_executor(None, acquisition.wait)
+    done.add_done_callback(lambda _: chunks.put_nowait(None))
+    try:
+        # inside try, so that a failed start still releases the waiting executor
+        await loop.run_in_executor(None, acquisition.start)
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await loop.run_in_executor(None, acquisition.stop)
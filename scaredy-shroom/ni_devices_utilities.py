@@ -5,51 +5,91 @@
 @email: 2291948161@qq.com
 """
 
-import nidaqmx
-import nidaqmx.stream_readers
-import nidaqmx.stream_writers
-import nidaqmx.constants
+import importlib
+import os
+import queue
+import struct
+import threading
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 
-def cfg_AI_task(samp_time, channel='cDAQ1AIM/ai0', rate=2.5e4, trigger='/cDAQ1/PFI0'):
+class _LazyModule:
+    """Module imported on first attribute access, together with `submodules`.
+
+    Keeps importing this module cheap for scripts that never touch the
+    hardware, and possible on machines without NI-DAQmx.
+    """
+
+    def __init__(self, name, submodules=()):
+        self._name = name
+        self._submodules = submodules
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            for submodule in self._submodules:
+                importlib.import_module('{}.{}'.format(self._name, submodule))
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+nidaqmx = _LazyModule('nidaqmx', ('stream_readers', 'stream_writers', 'constants'))
+
+
+def cfg_AI_task(samp_time, channel='cDAQ1AIM/ai0', rate=2.5e4, trigger='/cDAQ1/PFI0', raw=False):
     """Create a NI analog input task.
 
     Parameters
     ----------
     samp_time : float
         Sample time.
-    channel : str
-        Analog input channel name.
+    channel : str or list
+        Analog input channel name, a physical channel range such as
+        'Mod1/ai0:7', or a list of channel names.
     rate : float
         Sample rate.
     trigger : str
         Start trigger name.
+    raw : bool
+        Whether to read raw int16 ADC codes instead of float64 volts. Convert
+        them later with `scale_raw_data` and `get_scaling_coefficients`.
 
     Returns
     -------
     task : nidaqmx.task.Task
         NI-DAQmx analog input task.
     data : numpy.ndarray
-        1D NumPy array to hold samples.
+        1D NumPy array to hold samples for single channel, 2D NumPy array with a
+        row per channel for multiple channel.
     """
     # Create and configure task
     task = nidaqmx.Task()
-    task.ai_channels.add_ai_voltage_chan(channel)
+    n_channels = _add_ai_channels(task, channel)
     task.timing.samp_clk_rate = rate
     num_samples = int(samp_time * rate)
     task.timing.samp_quant_samp_per_chan = num_samples
     task.triggers.start_trigger.cfg_dig_edge_start_trig(trigger,
                                                         trigger_edge=nidaqmx.constants.Edge.RISING)
 
-    data = np.empty(num_samples, dtype=np.float64)
+    data = np.empty(_ai_shape(n_channels, num_samples), dtype=np.int16 if raw else np.float64)
 
     return task, data
 
 
-def read_data(task, data, timeout=nidaqmx.constants.WAIT_INFINITELY):
+def _add_ai_channels(task, channel):
+    """Add analog input voltage channels to task, returning the number of channels."""
+    if isinstance(channel, list):
+        channel = ', '.join(channel)
+    task.ai_channels.add_ai_voltage_chan(channel)
+    return task.number_of_channels
+
+
+def _ai_shape(n_channels, n_samples):
+    return (n_samples,) if n_channels == 1 else (n_channels, n_samples)
+
+
+def read_data(task, data, timeout=None):
     """Read samples from task.
 
     Parameters
@@ -57,9 +97,11 @@ def read_data(task, data, timeout=nidaqmx.constants.WAIT_INFINITELY):
     task : nidaqmx.task.Task
         A NI-DAQmx analog input task.
     data : numpy.ndarray
-        1D NumPy array to hold the requested samples.
+        1D NumPy array, or 2D NumPy array with a row per channel, to hold the
+        requested samples, float64 for volts or int16 for raw ADC codes.
     timeout : float
-        The amount of time in seconds to wait for samples to become available.
+        The amount of time in seconds to wait for samples to become available,
+        `nidaqmx.constants.WAIT_INFINITELY` if None.
 
     Notes
     -----
@@ -70,15 +112,510 @@ def read_data(task, data, timeout=nidaqmx.constants.WAIT_INFINITELY):
     Returns
     -------
     data : numpy.ndarray
-        1D NumPy array holding the samples requested.
+        NumPy array holding the samples requested.
     """
-    reader = nidaqmx.stream_readers.AnalogSingleChannelReader(task.in_stream)
+    reader = _ai_reader(task, data)
     # If set `timeout` to `nidaqmx.constants.WAIT_INFINITELY`, it will wait infinitely. 
-    reader.read_many_sample(data, len(data), timeout=timeout)
+    if timeout is None:
+        timeout = nidaqmx.constants.WAIT_INFINITELY
+    _read_samples(reader, data, timeout)
     return data
 
 
-def cfg_DO_task(channel='/cDAQ1DIOM/port0', rate=1e4):
+def _ai_reader(task, data):
+    """Stream reader of analog input task matching the dtype of data."""
+    if data.dtype == np.int16:
+        return nidaqmx.stream_readers.AnalogUnscaledReader(task.in_stream)
+    if data.ndim > 1:
+        return nidaqmx.stream_readers.AnalogMultiChannelReader(task.in_stream)
+    return nidaqmx.stream_readers.AnalogSingleChannelReader(task.in_stream)
+
+
+def _read_samples(reader, data, timeout):
+    """Read `data.shape[-1]` samples per channel into data."""
+    n_samples = data.shape[-1]
+    if data.dtype == np.int16:
+        # the unscaled reader takes a row per channel
+        reader.read_int16(data.reshape(-1, n_samples), n_samples, timeout=timeout)
+    else:
+        reader.read_many_sample(data, n_samples, timeout=timeout)
+
+
+def get_scaling_coefficients(task):
+    """Get the polynomial coefficients scaling raw ADC codes of each channel to volts.
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A NI-DAQmx analog input task.
+
+    Returns
+    -------
+    coefficients : numpy.ndarray
+        2D NumPy array with a row of coefficients per channel, in increasing order.
+    """
+    return np.array([chan.ai_dev_scaling_coeff for chan in task.ai_channels], dtype=np.float64)
+
+
+def scale_raw_data(data, coefficients):
+    """Scale raw ADC codes to volts.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Raw int16 samples, 1D for single channel or a row per channel.
+    coefficients : numpy.ndarray
+        Coefficients from `get_scaling_coefficients`.
+
+    Returns
+    -------
+    volts : numpy.ndarray
+        float64 array of the shape of data.
+    """
+    coefficients = np.atleast_2d(coefficients)
+    x = np.atleast_2d(np.asarray(data, dtype=np.float64))
+    # Horner's method, the highest order first
+    volts = np.zeros_like(x)
+    for order in reversed(range(coefficients.shape[1])):
+        volts *= x
+        volts += coefficients[:, order, np.newaxis]
+    return volts.reshape(np.shape(data))
+
+
+def scaling_file_path(data_file_path):
+    """Path of the scaling coefficients stored with raw data at `data_file_path`."""
+    root, ext = os.path.splitext(data_file_path)
+    return root + '_scaling' + (ext or '.npy')
+
+
+def save_scaling_coefficients(data_file_path, coefficients):
+    """Store scaling coefficients next to raw data saved at `data_file_path`."""
+    np.save(scaling_file_path(data_file_path), coefficients)
+
+
+def load_scaled_data(data_file_path, start=0, stop=None):
+    """Load raw data saved at `data_file_path` and scale samples [start, stop) to volts.
+
+    The raw data is memory-mapped, only the requested range is read and scaled.
+    """
+    data = np.load(data_file_path, mmap_mode='r')
+    coefficients = np.load(scaling_file_path(data_file_path))
+    return scale_raw_data(data[..., start:stop], coefficients)
+
+
+def cfg_continuous_AI_task(chunk_samples, channel='cDAQ1AIM/ai0', rate=2.5e4,
+                           trigger='/cDAQ1/PFI0', n_chunks=16, raw=False):
+    """Create a NI analog input task acquiring continuously, with a ring buffer of chunks.
+
+    Use it with `ContinuousAcquisition`, memory stays constant however long
+    the acquisition runs.
+
+    Parameters
+    ----------
+    chunk_samples : int
+        Number of samples per channel per chunk handed to consumers.
+    channel : str or list
+        Analog input channel name, a physical channel range or a list of
+        channel names, see `cfg_AI_task`.
+    rate : float
+        Sample rate.
+    trigger : str
+        Start trigger name, None to start on `task.start()`.
+    n_chunks : int
+        Number of chunks held by the ring buffer.
+    raw : bool
+        Whether to read raw int16 ADC codes instead of float64 volts.
+
+    Returns
+    -------
+    task : nidaqmx.task.Task
+        NI-DAQmx analog input task.
+    ring_buffer : RingBuffer
+        Preallocated ring buffer to hold chunks.
+    """
+    task = nidaqmx.Task()
+    n_channels = _add_ai_channels(task, channel)
+    task.timing.samp_clk_rate = rate
+    task.timing.samp_quant_samp_mode = nidaqmx.constants.AcquisitionType.CONTINUOUS
+    # sets the size of the driver buffer in continuous mode
+    task.timing.samp_quant_samp_per_chan = n_chunks * chunk_samples
+    if trigger is not None:
+        task.triggers.start_trigger.cfg_dig_edge_start_trig(
+            trigger, trigger_edge=nidaqmx.constants.Edge.RISING)
+
+    ring_buffer = RingBuffer(chunk_samples, n_chunks, dtype=np.int16 if raw else np.float64,
+                             n_channels=n_channels)
+
+    return task, ring_buffer
+
+
+class RingBuffer:
+    """Preallocated ring of fixed-size chunks.
+
+    Parameters
+    ----------
+    chunk_samples : int
+        Number of samples per chunk.
+    n_chunks : int
+        Number of chunks held, the oldest chunk is overwritten first.
+    dtype : numpy.dtype
+    n_channels : int
+        Chunks of multiple channel have a row per channel.
+    """
+
+    def __init__(self, chunk_samples, n_chunks, dtype=np.float64, n_channels=1):
+        self.chunk_samples = chunk_samples
+        self.n_chunks = n_chunks
+        self.buffer = np.empty((n_chunks,) + _ai_shape(n_channels, chunk_samples), dtype=dtype)
+        # number of chunks written since creation
+        self.n_written = 0
+
+    def next_chunk(self):
+        """Slot the next chunk is written into."""
+        return self.buffer[self.n_written % self.n_chunks]
+
+    def commit(self):
+        """Mark the slot from `next_chunk` as written and return it."""
+        chunk = self.next_chunk()
+        self.n_written += 1
+        return chunk
+
+    def latest(self, n_chunks=None):
+        """Copy of the latest `n_chunks` chunks, all held chunks by default, oldest first."""
+        n_held = min(self.n_written, self.n_chunks)
+        n_chunks = n_held if n_chunks is None else min(n_chunks, n_held)
+        slots = np.arange(self.n_written - n_chunks, self.n_written) % self.n_chunks
+        return np.concatenate(list(self.buffer[slots]) or [self.buffer[0, ..., :0]], axis=-1)
+
+
+class ContinuousAcquisition:
+    """Read a continuous analog input task chunk by chunk as samples arrive.
+
+    Every `ring_buffer.chunk_samples` samples acquired, DAQmx calls back on
+    its own thread, the chunk is read straight into the next ring buffer
+    slot and handed to each consumer.
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A continuous NI-DAQmx analog input task, not started, e.g. from
+        `cfg_continuous_AI_task`.
+    ring_buffer : RingBuffer
+    consumers : list of callable
+        Called with each chunk. The chunk is a view of the ring buffer slot,
+        copy it to keep it longer than `ring_buffer.n_chunks` chunks.
+    timeout : float
+        The amount of time in seconds to wait for a chunk once notified.
+    max_chunks : int
+        If given, chunks after the first `max_chunks` are ignored and `wait`
+        returns once they are read.
+
+    Attributes
+    ----------
+    error : Exception
+        First exception raised while reading or by a consumer, re-raised by `stop`.
+    """
+
+    def __init__(self, task, ring_buffer, consumers=(), timeout=10.0, max_chunks=None):
+        self.task = task
+        self.ring_buffer = ring_buffer
+        self.consumers = list(consumers)
+        self.timeout = timeout
+        self.max_chunks = max_chunks
+        self.n_chunks = 0
+        self.error = None
+        self._done = threading.Event()
+        self.reader = _ai_reader(task, ring_buffer.next_chunk())
+        task.register_every_n_samples_acquired_into_buffer_event(
+            ring_buffer.chunk_samples, self._on_samples_acquired)
+
+    def _on_samples_acquired(self, task_handle, every_n_samples_event_type,
+                             number_of_samples, callback_data):
+        if self._done.is_set():
+            return 0
+        # exceptions cannot propagate through the DAQmx callback, keep the first one
+        try:
+            chunk = self.ring_buffer.next_chunk()
+            _read_samples(self.reader, chunk, self.timeout)
+            self.ring_buffer.commit()
+            for consumer in self.consumers:
+                consumer(chunk)
+        except Exception as error:
+            self.error = error
+            self._done.set()
+        self.n_chunks += 1
+        if self.max_chunks is not None and self.n_chunks >= self.max_chunks:
+            self._done.set()
+        return 0
+
+    def start(self):
+        self.task.start()
+
+    def wait(self, timeout=None):
+        """Wait until `max_chunks` chunks are read or an error occurs.
+
+        Returns False if `timeout` seconds passed first.
+        """
+        return self._done.wait(timeout)
+
+    def stop(self):
+        """Stop task, raising the first error met while acquiring.
+
+        Chunks arriving after this are ignored and `wait` returns.
+        """
+        self._done.set()
+        self.task.stop()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.task.close()
+
+
+class BackgroundAIReader:
+    """Read analog input task chunk by chunk on a dedicated thread.
+
+    Chunks are read into a pool of preallocated buffers, alternating between
+    two by default, and handed over through a bounded queue. The read copies
+    run without the GIL, leaving the calling thread free to process data.
+
+    Examples
+    --------
+        reader = BackgroundAIReader(task, chunk_samples=5000, max_chunks=100)
+        reader.start()
+        for chunk in reader:
+            process(chunk)
+        reader.stop()
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A NI-DAQmx analog input task, not started.
+    chunk_samples : int
+        Number of samples per channel per chunk.
+    n_buffers : int
+        Number of preallocated chunk buffers.
+    raw : bool
+        Whether to read raw int16 ADC codes instead of float64 volts.
+    drop_when_full : bool
+        What to do when every buffer is held by the consumer. If False the
+        reader waits, relying on the driver buffer to absorb the delay. If True
+        the chunk is read into a scratch buffer and dropped.
+    timeout : float
+        The amount of time in seconds to wait for each chunk.
+    max_chunks : int
+        Stop reading after `max_chunks` chunks, read until `stop` by default.
+
+    Attributes
+    ----------
+    n_chunks_read : int
+        Chunks handed to the consumer.
+    n_chunks_waited : int
+        Chunks for which the reader had to wait for a free buffer.
+    n_chunks_dropped : int
+        Chunks dropped because no buffer was free.
+    """
+
+    def __init__(self, task, chunk_samples, n_buffers=2, raw=False, drop_when_full=False,
+                 timeout=10.0, max_chunks=None):
+        self.task = task
+        self.drop_when_full = drop_when_full
+        self.timeout = timeout
+        self.max_chunks = max_chunks
+        self.n_chunks_read = 0
+        self.n_chunks_waited = 0
+        self.n_chunks_dropped = 0
+        shape = _ai_shape(task.number_of_channels, chunk_samples)
+        dtype = np.int16 if raw else np.float64
+        self._free = queue.Queue()
+        for _ in range(n_buffers):
+            self._free.put(np.empty(shape, dtype=dtype))
+        self._scratch = np.empty(shape, dtype=dtype)
+        self._filled = queue.Queue(maxsize=n_buffers)
+        self._reader = _ai_reader(task, self._scratch)
+        self._stopping = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._read_chunks, daemon=True)
+
+    def _read_chunks(self):
+        try:
+            while not self._stopping.is_set():
+                if self.max_chunks is not None and self.n_chunks_read >= self.max_chunks:
+                    break
+                buffer = self._free_buffer()
+                if buffer is None:
+                    break
+                _read_samples(self._reader, buffer, self.timeout)
+                if buffer is self._scratch:
+                    self.n_chunks_dropped += 1
+                    continue
+                self.n_chunks_read += 1
+                self._filled.put(buffer)
+        except Exception as error:
+            # reading fails when task is stopped under it, only report other errors
+            if not self._stopping.is_set():
+                self._error = error
+        finally:
+            self._filled.put(None)
+
+    def _free_buffer(self):
+        """Next free buffer, the scratch buffer if dropping, None if stopping."""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            if self.drop_when_full:
+                return self._scratch
+        self.n_chunks_waited += 1
+        while not self._stopping.is_set():
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def start(self):
+        self.task.start()
+        self._thread.start()
+
+    def get(self, timeout=None):
+        """Next filled chunk, None once reading finished.
+
+        Give the chunk back with `release` when done with it.
+        """
+        chunk = self._filled.get(timeout=timeout)
+        if chunk is None:
+            # keep the end marker for later calls
+            self._filled.put(None)
+            if self._error is not None:
+                raise self._error
+        return chunk
+
+    def release(self, chunk):
+        """Return a chunk from `get` to the pool of free buffers."""
+        self._free.put(chunk)
+
+    def __iter__(self):
+        while True:
+            chunk = self.get()
+            if chunk is None:
+                return
+            try:
+                yield chunk
+            finally:
+                self.release(chunk)
+
+    def stop(self):
+        """Stop reading and stop task, raising the first error met while reading."""
+        self._stopping.set()
+        if self._thread.is_alive():
+            # abort the read in flight, which otherwise waits for its chunk up
+            # to `timeout`, the aborted read fails and the error is ignored
+            abort_task(self.task)
+        # unblock the reader if it waits to hand over a chunk
+        while self._thread.is_alive():
+            try:
+                self._filled.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        # drop chunks not taken, leaving only the end marker
+        while not self._filled.empty():
+            self._filled.get_nowait()
+        self._filled.put(None)
+        self.task.stop()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        self.task.close()
+
+
+class NpyStreamWriter:
+    """Append chunks to a `.npy` file from a background thread.
+
+    Use it as a `ContinuousAcquisition` consumer, each chunk is copied and
+    queued so that disk I/O stays off the read loop. The header is written
+    with a placeholder shape first and completed by `close`, so the file
+    loads with `np.load(filename, mmap_mode='r')`.
+
+    2D chunks with a row per channel are stored interleaved by sample, as a
+    Fortran-ordered (channels, samples) array.
+
+    Parameters
+    ----------
+    filename : str
+    queue_size : int
+        Number of chunks waiting to be written, once reached the caller
+        blocks until the writer catches up.
+
+    Attributes
+    ----------
+    n_samples : int
+        Number of samples per channel written.
+    """
+
+    _header_size = 128
+
+    def __init__(self, filename, queue_size=64):
+        self.filename = filename
+        self.n_samples = 0
+        self._file = open(filename, 'wb')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._dtype = None
+        self._n_channels = None
+        self._error = None
+        self._thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self._thread.start()
+
+    def __call__(self, chunk):
+        if self._error is not None:
+            raise self._error
+        if self._dtype is None:
+            self._dtype = chunk.dtype
+            self._n_channels = chunk.shape[0] if chunk.ndim > 1 else None
+            self._file.write(self._header())
+        # copy, the chunk may be a ring buffer slot, with the samples of all
+        # channels interleaved as in a Fortran-ordered array
+        self._queue.put(np.array(chunk.T, order='C'))
+
+    def _write_chunks(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    chunk.tofile(self._file)
+                    self.n_samples += chunk.shape[0]
+                except Exception as error:
+                    self._error = error
+
+    def _header(self):
+        if self._n_channels is None:
+            shape, fortran_order = (self.n_samples,), False
+        else:
+            shape, fortran_order = (self._n_channels, self.n_samples), True
+        header = repr({'descr': np.lib.format.dtype_to_descr(self._dtype),
+                       'fortran_order': fortran_order, 'shape': shape}).encode('latin1')
+        # magic string, version 1.0, header length, then header padded to a fixed size
+        header_len = self._header_size - 10
+        return (b'\x93NUMPY\x01\x00' + struct.pack('<H', header_len)
+                + header.ljust(header_len - 1) + b'\n')
+
+    def close(self):
+        """Write the queued chunks and complete the header."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._dtype is None:
+            # no chunk written, leave an empty array
+            self._dtype = np.dtype(np.float64)
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+
+def cfg_DO_task(channel='/cDAQ1DIOM/port0', rate=1e4, n_samples=None, buffer_length=None):
     """Create a NI digital output task.
 
     Parameters
@@ -87,6 +624,14 @@ def cfg_DO_task(channel='/cDAQ1DIOM/port0', rate=1e4):
         Digital output channel name.
     rate : float
         Sample rate.
+    n_samples : int
+        If given, generate `n_samples` samples per channel then stop, otherwise
+        generate continuously.
+    buffer_length : int
+        Output buffer size in samples per channel. Set it to the length of the
+        data written when `n_samples` is larger, the device then regenerates the
+        buffer until `n_samples` samples are generated, e.g. to repeat a single
+        period of a timing wave.
 
     Returns
     -------
@@ -101,12 +646,14 @@ def cfg_DO_task(channel='/cDAQ1DIOM/port0', rate=1e4):
         task.do_channels.add_do_chan(channel)
     task.timing.samp_clk_rate = rate
     task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-    task.timing.samp_quant_samp_mode = nidaqmx.constants.AcquisitionType.CONTINUOUS
-    # FINITE mode may be ok
-    # task.timing.samp_quant_samp_mode = nidaqmx.constants.AcquisitionType.FINITE
-    # may not need
-    # task.timing.samp_quant_samp_per_chan = buffer_length
-    # task.out_stream.regen_mode = nidaqmx.constants.RegenerationMode.ALLOW_REGENERATION
+    if n_samples is None:
+        task.timing.samp_quant_samp_mode = nidaqmx.constants.AcquisitionType.CONTINUOUS
+    else:
+        task.timing.samp_quant_samp_mode = nidaqmx.constants.AcquisitionType.FINITE
+        task.timing.samp_quant_samp_per_chan = n_samples
+    if buffer_length is not None:
+        task.out_stream.output_buf_size = buffer_length
+    task.out_stream.regen_mode = nidaqmx.constants.RegenerationMode.ALLOW_REGENERATION
     return task
 
 
@@ -118,15 +665,80 @@ def write_digital_data(task, data, multi_channel=False):
     task : nidaqmx.task.Task
         A NI-DAQmx digital output task.
     data : numpy.ndarray
-        1D NumPy array containing digital wave.
+        1D NumPy array containing digital wave, or 2D NumPy array with a row per
+        channel if the task containing multiple channel. uint8, uint16 and uint32
+        data are written to 8-, 16- and 32-line ports respectively, e.g. a
+        channel 'Mod1/port0:1' takes uint16 data.
+    multi_channel : bool
+        Whether task containing multiple channel.
+
+    Notes
+    -----
+    The stream writers need C-contiguous data, so strided views, such as the
+    rows returned by `timing_utility.generate_timing_wave(n_channel>1)`, are
+    copied once here. Contiguous data is passed through without copying.
+    """
+    writer = _digital_writer(task, multi_channel)
+    _write_port_data(writer, data)
+
+
+def stream_digital_data(task, data, block_samples=2**20, multi_channel=False, timeout=10.0):
+    """Write digital data to task block by block, starting task once its buffer is filled.
+
+    Only one block of `data` is held in RAM at a time, so `data` can be a
+    `np.memmap` larger than RAM, such as the one returned by
+    `timing_utility.open_timing_wave_memmap`. The task is switched to finite
+    generation of `data` without regeneration, with an output buffer of two
+    blocks. Returns once the last block is written, wait for the generation
+    to finish with `task.wait_until_done()`.
+
+    Parameters
+    ----------
+    task : nidaqmx.task.Task
+        A NI-DAQmx digital output task, not started.
+    data : numpy.ndarray
+        1D NumPy array containing digital wave, or 2D NumPy array with a row per
+        channel if the task containing multiple channel.
+    block_samples : int
+        Number of samples per channel written at a time.
     multi_channel : bool
         Whether task containing multiple channel.
+    timeout : float
+        The amount of time in seconds to wait for buffer space for each block.
     """
+    n_samples = data.shape[-1]
+    buffer_length = min(n_samples, 2 * block_samples)
+    task.timing.samp_quant_samp_mode = nidaqmx.constants.AcquisitionType.FINITE
+    task.timing.samp_quant_samp_per_chan = n_samples
+    task.out_stream.regen_mode = nidaqmx.constants.RegenerationMode.DONT_ALLOW_REGENERATION
+    task.out_stream.output_buf_size = buffer_length
+    writer = _digital_writer(task, multi_channel)
+    for start in range(0, n_samples, block_samples):
+        if start == buffer_length:
+            # buffer is full, start generating before writing more
+            task.start()
+        _write_port_data(writer, data[..., start:start + block_samples], timeout=timeout)
+    if n_samples <= buffer_length:
+        task.start()
+
+
+def _digital_writer(task, multi_channel):
     if multi_channel:
-        writer = nidaqmx.stream_writers.DigitalMultiChannelWriter(task.out_stream)
+        return nidaqmx.stream_writers.DigitalMultiChannelWriter(task.out_stream)
+    return nidaqmx.stream_writers.DigitalSingleChannelWriter(task.out_stream)
+
+
+def _write_port_data(writer, data, timeout=10.0):
+    # The stream writers need C-contiguous data.
+    data = np.ascontiguousarray(data)
+    if data.dtype == np.uint8:
+        writer.write_many_sample_port_byte(data, timeout=timeout)
+    elif data.dtype == np.uint16:
+        writer.write_many_sample_port_uint16(data, timeout=timeout)
+    elif data.dtype == np.uint32:
+        writer.write_many_sample_port_uint32(data, timeout=timeout)
     else:
-        writer = nidaqmx.stream_writers.DigitalSingleChannelWriter(task.out_stream)
-    writer.write_many_sample_port_byte(data)
+        raise TypeError('digital data must be uint8, uint16 or uint32, got {}'.format(data.dtype))
 
 
 def cfg_task(task, rate=None):
@@ -151,15 +763,116 @@ def abort_task(task):
     task.control(nidaqmx.constants.TaskMode.TASK_ABORT)
 
 
+def min_max_envelope(data, n_bins, start=0, stop=None):
+    """Reduce data[start:stop] to the minimum and maximum of `n_bins` bins.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        1D NumPy array or `np.memmap` of samples.
+    n_bins : int
+        Number of bins, e.g. the width of the plot in pixels.
+    start, stop : int
+        Range of samples to reduce.
+
+    Returns
+    -------
+    index : numpy.ndarray
+        Sample index of each returned point, each bin gives two points at its start.
+    envelope : numpy.ndarray
+        Alternating bin minimum and maximum, or the samples themselves if there
+        are no more than two per bin.
+    """
+    stop = len(data) if stop is None else min(stop, len(data))
+    start = max(start, 0)
+    n_samples = stop - start
+    if n_samples <= 2 * n_bins:
+        return np.arange(start, stop), np.asarray(data[start:stop])
+    bin_size = n_samples // n_bins
+    bins = data[start:start + n_bins * bin_size].reshape(n_bins, bin_size)
+    envelope = np.column_stack((bins.min(axis=1), bins.max(axis=1))).ravel()
+    index = np.repeat(np.arange(start, start + n_bins * bin_size, bin_size), 2)
+    # samples left over are fewer than a bin, keep them as they are
+    tail = start + n_bins * bin_size
+    return (np.concatenate((index, np.arange(tail, stop))),
+            np.concatenate((envelope, data[tail:stop])))
+
+
+class EnvelopePlot:
+    """Line showing min/max envelope of analog data, recomputed on zoom and pan.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+    data : numpy.ndarray
+        1D NumPy array or `np.memmap` at full resolution.
+    sample_rate : float
+    """
+
+    def __init__(self, ax, data, sample_rate, **kwargs):
+        self.ax = ax
+        self.data = data
+        self.sample_rate = sample_rate
+        self.line, = ax.plot([], [], **kwargs)
+        ax.set_xlim(0, len(data) / sample_rate)
+        if len(data):
+            envelope = min_max_envelope(data, 1)[1]
+            lo, hi = envelope.min(), envelope.max()
+            if lo == hi:
+                # constant data, give the line some room
+                pad = 0.05 * abs(lo) or 1.0
+                lo, hi = lo - pad, hi + pad
+            ax.set_ylim(lo, hi)
+        self.update(ax)
+        ax.callbacks.connect('xlim_changed', self.update)
+
+    def update(self, ax):
+        """Re-decimate the samples in the visible range to the axes width in pixels."""
+        x_min, x_max = ax.get_xlim()
+        start = int(np.floor(x_min * self.sample_rate))
+        stop = int(np.ceil(x_max * self.sample_rate)) + 1
+        n_bins = max(int(ax.bbox.width), 1)
+        index, envelope = min_max_envelope(self.data, n_bins, start, stop)
+        self.line.set_data(index / self.sample_rate, envelope)
+        ax.figure.canvas.draw_idle()
+
+
+def plot_analog_data(data, sample_rate, ax=None, **kwargs):
+    """Plot analog data with draw time bounded by the axes width.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        1D NumPy array or `np.memmap` of samples.
+    sample_rate : float
+    ax : matplotlib.axes.Axes
+        Axes to plot on, a new figure is created by default.
+    kwargs
+        Passed to `Axes.plot`.
+
+    Returns
+    -------
+    plot : EnvelopePlot
+        Keep a reference while the figure is shown, it handles zoom and pan.
+    """
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        fig, ax = plt.subplots()
+    ax.set_xlabel('Time (s)')
+    return EnvelopePlot(ax, data, sample_rate, **kwargs)
+
+
 def main():
+    import matplotlib.pyplot as plt
+
     samp_time = 5
     task, data = cfg_AI_task(samp_time=samp_time, channel='cDAQ1AIM/ai0', rate=2.5e4)
     y = read_data(task, data)
     task.stop()
     task.close()
-    x = np.linspace(0, samp_time, len(y))
-    fig, ax = plt.subplots()
-    ax.plot(x, y)
+    # keep a reference to the plot so that zoom and pan keep re-decimating
+    plot = plot_analog_data(y, 2.5e4)
     plt.show()
 
 
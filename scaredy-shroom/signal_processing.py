@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""Streaming processing of acquired data.
+
+@author: SilentCA
+@email: 2291948161@qq.com
+
+Every stage is called with consecutive chunks of samples, 1D for single
+channel or with a row per channel, keeps its state across chunks and
+passes its output on to its own consumers. Stages can therefore be used
+as consumers of `ni_devices_utilities.ContinuousAcquisition`, e.g.
+
+    writer = ni_devices_utilities.NpyStreamWriter(data_file_path)
+    decimator = BoxcarDecimator(50, consumers=[writer])
+    acquisition = ni_devices_utilities.ContinuousAcquisition(
+            task, ring_buffer, consumers=[decimator])
+"""
+
+import numpy as np
+
+import timing_utility
+
+
+class _Stage:
+    """Processing stage passing the output of each chunk to its consumers."""
+
+    def __init__(self, consumers=()):
+        self.consumers = list(consumers)
+
+    def __call__(self, chunk):
+        output = self.process(np.asarray(chunk))
+        if output.shape[-1]:
+            for consumer in self.consumers:
+                consumer(output)
+        return output
+
+    def process(self, chunk):
+        raise NotImplementedError
+
+
+class BoxcarDecimator(_Stage):
+    """Average each `factor` consecutive samples.
+
+    Parameters
+    ----------
+    factor : int
+        Decimation factor.
+    consumers : list of callable
+        Called with each decimated chunk.
+    """
+
+    def __init__(self, factor, consumers=()):
+        super().__init__(consumers)
+        self.factor = factor
+        self._pending = None
+
+    def process(self, chunk):
+        if self._pending is not None:
+            chunk = np.concatenate((self._pending, chunk), axis=-1)
+        n_samples = chunk.shape[-1] // self.factor * self.factor
+        # samples of an incomplete block wait for the next chunk
+        self._pending = chunk[..., n_samples:].copy()
+        blocks = chunk[..., :n_samples].reshape(*chunk.shape[:-1], -1, self.factor)
+        return blocks.mean(axis=-1)
+
+
+class CICDecimator(_Stage):
+    """Cascaded integrator-comb decimation.
+
+    Equivalent to `order` cascaded boxcar filters of `factor` samples followed
+    by decimation, computed with running sums, normalized to unit DC gain.
+    Samples are accumulated exactly in int64 with wrap-around, so the output
+    does not drift however long the run. Integer samples, such as raw int16
+    data, are used as is. Float samples are quantized to fixed point, with
+    the finest step leaving room in int64 for the gain `factor ** order`,
+    and need `full_scale`.
+
+    Parameters
+    ----------
+    factor : int
+        Decimation factor.
+    order : int
+        Number of integrator and comb stages.
+    full_scale : float
+        Largest absolute value of float samples, required for float samples,
+        e.g. the `ai_rng_high` of the channel. Samples beyond it are
+        saturated and counted in `n_saturated`.
+    consumers : list of callable
+        Called with each decimated chunk.
+
+    Attributes
+    ----------
+    n_saturated : int
+        Float samples saturated to `full_scale`, NaN samples taken as 0 included.
+    """
+
+    def __init__(self, factor, order=3, full_scale=None, consumers=()):
+        super().__init__(consumers)
+        self.factor = factor
+        self.order = order
+        self.full_scale = full_scale
+        self.n_saturated = 0
+        self._scale = None
+        self._integrators = None
+        self._combs = None
+        self._n_samples = 0
+
+    def process(self, chunk):
+        if chunk.shape[-1] == 0:
+            # an empty chunk would leave empty integrator states
+            return np.zeros(chunk.shape, dtype=np.float64)
+        if self._integrators is None:
+            if not np.issubdtype(chunk.dtype, np.integer):
+                self._scale = self._fixed_point_scale()
+            state_shape = chunk.shape[:-1] + (1,)
+            self._integrators = [np.zeros(state_shape, dtype=np.int64) for _ in range(self.order)]
+            self._combs = [np.zeros(state_shape, dtype=np.int64) for _ in range(self.order)]
+        y = self._quantize(chunk)
+        for idx in range(self.order):
+            y = np.cumsum(y, axis=-1, dtype=np.int64) + self._integrators[idx]
+            self._integrators[idx] = y[..., -1:]
+        # keep every `factor`-th sample counted from the start of the acquisition
+        start = -(self._n_samples + 1) % self.factor
+        self._n_samples += chunk.shape[-1]
+        y = y[..., start::self.factor]
+        for idx in range(self.order):
+            previous = np.concatenate((self._combs[idx], y[..., :-1]), axis=-1)
+            if y.shape[-1]:
+                self._combs[idx] = y[..., -1:]
+            y = y - previous
+        gain = float(self.factor) ** self.order
+        if self._scale is not None:
+            gain *= self._scale
+        return y / gain
+
+    def _fixed_point_scale(self):
+        """Fixed point steps per unit, a power of two."""
+        if self.full_scale is None:
+            raise ValueError('full_scale is required to decimate float samples')
+        growth = int(np.ceil(self.order * np.log2(self.factor)))
+        if growth >= 62:
+            raise ValueError('gain of {} stages decimating by {} does not fit in int64'
+                             .format(self.order, self.factor))
+        # full scale times the gain stays within 2 ** 62
+        return 2.0 ** (62 - growth - int(np.ceil(np.log2(self.full_scale))))
+
+    def _quantize(self, chunk):
+        if self._scale is None:
+            return chunk.astype(np.int64)
+        # also catches NaN
+        in_range = np.abs(chunk) <= self.full_scale
+        if not np.all(in_range):
+            self.n_saturated += int(in_range.size - np.count_nonzero(in_range))
+            chunk = np.clip(np.nan_to_num(chunk, nan=0.0), -self.full_scale, self.full_scale)
+        return np.rint(chunk * self._scale).astype(np.int64)
+
+
+class FIRDecimator(_Stage):
+    """Anti-aliasing low-pass FIR filter followed by decimation.
+
+    The filter is a Hamming-windowed sinc with unit DC gain. Only the kept
+    output samples are computed.
+
+    Parameters
+    ----------
+    factor : int
+        Decimation factor.
+    numtaps : int
+        Filter length, `8 * factor + 1` by default.
+    cutoff : float
+        Cutoff frequency relative to the decimated Nyquist frequency.
+    consumers : list of callable
+        Called with each decimated chunk.
+    """
+
+    def __init__(self, factor, numtaps=None, cutoff=0.8, consumers=()):
+        super().__init__(consumers)
+        self.factor = factor
+        if numtaps is None:
+            numtaps = 8 * factor + 1
+        # cutoff in cycles per input sample
+        fc = 0.5 * cutoff / factor
+        n = np.arange(numtaps) - (numtaps - 1) / 2
+        taps = 2 * fc * np.sinc(2 * fc * n) * np.hamming(numtaps)
+        self.taps = taps / taps.sum()
+        self._history = None
+        self._n_samples = 0
+
+    def process(self, chunk):
+        if chunk.shape[-1] == 0:
+            return np.zeros(chunk.shape, dtype=np.float64)
+        numtaps = len(self.taps)
+        if self._history is None:
+            self._history = np.zeros(chunk.shape[:-1] + (numtaps - 1,), dtype=np.float64)
+        x = np.concatenate((self._history, chunk), axis=-1)
+        self._history = x[..., x.shape[-1] - (numtaps - 1):]
+        # window j ends at input sample `self._n_samples + j`
+        start = -self._n_samples % self.factor
+        self._n_samples += chunk.shape[-1]
+        windows = np.lib.stride_tricks.sliding_window_view(x, numtaps, axis=-1)
+        return windows[..., start::self.factor, :] @ self.taps[::-1]
+
+
+def period_samples(timing_sequence_list, sample_rate, tolerance=1e-9):
+    """Period of timing sequence in samples at `sample_rate`.
+
+    Parameters
+    ----------
+    timing_sequence_list : list
+        List of (value, duration in seconds), see `timing_utility`.
+    sample_rate : float
+    tolerance : float
+        Largest allowed difference, in samples, between the period and a whole
+        number of samples.
+
+    Returns
+    -------
+    n_samples : int
+    """
+    period = sum(t[1] for t in timing_sequence_list) * sample_rate
+    n_samples = round(period)
+    if n_samples < 1 or abs(period - n_samples) > tolerance:
+        raise ValueError('timing sequence period is {} samples, not a whole number'.format(period))
+    return n_samples
+
+
+class FoldAccumulator(_Stage):
+    """Average data synchronously with a repeated timing sequence.
+
+    Each sample is added to the running sum and sum of squares of its phase
+    within the period, so memory is proportional to the period. Phase 0 is
+    the first sample passed in, so the acquisition should be triggered by
+    the start of the timing sequence.
+
+    Parameters
+    ----------
+    period : int
+        Period in samples, e.g. from `period_samples`.
+    consumers : list of callable
+        Called with the samples of each chunk, the accumulator does not
+        change them.
+
+    Attributes
+    ----------
+    counts : numpy.ndarray
+        Number of samples accumulated at each phase.
+    """
+
+    def __init__(self, period, consumers=()):
+        super().__init__(consumers)
+        self.period = period
+        self.counts = np.zeros(period, dtype=np.int64)
+        self._sum = None
+        self._sum_sq = None
+        self._phase = 0
+
+    def process(self, chunk):
+        if self._sum is None:
+            self._sum = np.zeros(chunk.shape[:-1] + (self.period,), dtype=np.float64)
+            self._sum_sq = np.zeros_like(self._sum)
+        x = chunk.astype(np.float64)
+        n_samples = x.shape[-1]
+        # samples completing the current period
+        head = min(n_samples, self.period - self._phase)
+        self._accumulate(x[..., :head], self._phase)
+        # whole periods, then the start of the next one
+        rest = x[..., head:]
+        n_periods = rest.shape[-1] // self.period
+        if n_periods:
+            folded = rest[..., :n_periods * self.period].reshape(
+                *rest.shape[:-1], n_periods, self.period)
+            self._sum += folded.sum(axis=-2)
+            self._sum_sq += (folded * folded).sum(axis=-2)
+            self.counts += n_periods
+        self._accumulate(rest[..., n_periods * self.period:], 0)
+        self._phase = (self._phase + n_samples) % self.period
+        return chunk
+
+    def _accumulate(self, x, phase):
+        """Add samples of less than a period starting at `phase`."""
+        stop = phase + x.shape[-1]
+        self._sum[..., phase:stop] += x
+        self._sum_sq[..., phase:stop] += x * x
+        self.counts[phase:stop] += 1
+
+    @property
+    def mean(self):
+        """Averaged trace over one period."""
+        return self._sum / self.counts
+
+    @property
+    def variance(self):
+        """Variance of the samples at each phase over the periods."""
+        mean = self.mean
+        return np.maximum(self._sum_sq / self.counts - mean * mean, 0)
+
+
+def lock_in_reference(timing_sequence_list, sample_rate, bit=0):
+    """Build one period of lock-in reference from a bit of timing sequence.
+
+    The bit is sampled on the AI clock, edges rounded to the nearest sample,
+    and its strongest harmonic of the sequence period is used as reference
+    frequency, with the phase of that harmonic.
+
+    Parameters
+    ----------
+    timing_sequence_list : list
+        List of (value, duration in seconds), see `timing_utility`.
+    sample_rate : float
+        AI sample rate.
+    bit : int
+        Bit of the timing sequence values driving the modulation.
+
+    Returns
+    -------
+    reference : numpy.ndarray
+        Complex array `exp(-1j * (2 * pi * f * t + phase))` over one period.
+    """
+    period = period_samples(timing_sequence_list, sample_rate)
+    ends = np.round(np.cumsum([t[1] for t in timing_sequence_list]) * sample_rate).astype(np.int64)
+    timing_sequence = timing_utility.TimingSequence(
+        [t[0] for t in timing_sequence_list], np.diff(ends, prepend=0), sample_rate)
+    modulation = (timing_sequence.expand(dtype=np.uint64) >> np.uint64(bit)) & np.uint64(1)
+    spectrum = np.fft.rfft(modulation.astype(np.float64))
+    if not np.any(spectrum[1:]):
+        raise ValueError('bit {} of timing sequence never changes'.format(bit))
+    harmonic = np.argmax(np.abs(spectrum[1:])) + 1
+    n = np.arange(period)
+    return np.exp(-1j * (2 * np.pi * harmonic * n / period + np.angle(spectrum[harmonic])))
+
+
+class LockInDemodulator(_Stage):
+    """Demodulate data against a periodic reference.
+
+    Each chunk is multiplied by the reference, continuing its phase across
+    chunks, and averaged over `output_samples` samples. A signal
+    `A * cos(2 * pi * f * t + phase + theta)` gives `A * exp(1j * theta)`.
+    Choose `output_samples` as a multiple of the reference period to cancel
+    the component at twice the reference frequency.
+
+    Parameters
+    ----------
+    reference : numpy.ndarray
+        One period of complex reference, e.g. from `lock_in_reference`.
+    output_samples : int
+        Number of input samples per output value, one reference period by default.
+    consumers : list of callable
+        Called with each chunk of complex demodulated values.
+    """
+
+    def __init__(self, reference, output_samples=None, consumers=()):
+        super().__init__(consumers)
+        self.reference = np.asarray(reference)
+        if output_samples is None:
+            output_samples = len(self.reference)
+        self._lowpass = BoxcarDecimator(output_samples)
+        self._phase = 0
+
+    def process(self, chunk):
+        period = len(self.reference)
+        reference = self.reference[(self._phase + np.arange(chunk.shape[-1])) % period]
+        self._phase = (self._phase + chunk.shape[-1]) % period
+        return self._lowpass(2 * chunk * reference)
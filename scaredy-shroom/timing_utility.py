@@ -36,22 +36,273 @@ Examples:
             0b10,
             0b10
             ]
+    and corresponding edges, (sample index, new value) of each transition
+    timing_edges_example = (
+            [0, 3, 5],
+            [0b10, 0b01, 0b10]
+            )
 """
 
+import collections
+import hashlib
+import os
+
 import numpy as np
-import matplotlib.pyplot as plt
 
 
-def generate_timing_wave(timing_sequence_list, sample_rate, bit_num=8, n_channel=1):
+class TimingSequence:
+    """Run-length encoded timing sequence.
+
+    Each segment holds a value and its duration in samples, so memory and
+    build time scale with the number of segments instead of the number of
+    samples. Samples are only materialized by `expand` for the range asked for.
+
+    Parameters
+    ----------
+        values : array_like
+            Value of each segment.
+        counts : array_like
+            Duration of each segment in samples.
+        sample_rate : float
+            Sample rate the counts refer to, None if unknown.
+    """
+
+    def __init__(self, values, counts, sample_rate=None):
+        self.values = np.asarray(values, dtype=np.uint64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        if self.values.shape != self.counts.shape or self.values.ndim != 1:
+            raise ValueError('values and counts must be 1D arrays of the same length')
+        if np.any(self.counts < 0):
+            raise ValueError('segment durations must not be negative')
+        self.sample_rate = sample_rate
+        # end sample (exclusive) of each segment
+        self.ends = np.cumsum(self.counts)
+
+    @classmethod
+    def from_list(cls, timing_sequence_list, sample_rate):
+        """Create a timing sequence from a list of (value, duration in seconds)."""
+        values = np.array([t[0] for t in timing_sequence_list], dtype=np.uint64)
+        durations = np.array([t[1] for t in timing_sequence_list], dtype=np.float64)
+        # same round-half-to-even as the builtin `round`
+        counts = np.round(durations * sample_rate).astype(np.int64)
+        return cls(values, counts, sample_rate)
+
+    @property
+    def n_segments(self):
+        return len(self.counts)
+
+    @property
+    def n_samples(self):
+        return int(self.ends[-1]) if len(self.ends) else 0
+
+    def __len__(self):
+        return self.n_samples
+
+    def __repr__(self):
+        return '{}(n_segments={}, n_samples={}, sample_rate={})'.format(
+            type(self).__name__, self.n_segments, self.n_samples, self.sample_rate)
+
+    def edges(self):
+        """Sample index and new value of each transition, see `wave_to_edges`."""
+        values, counts = _merge_segments(self.values, self.counts)
+        return np.cumsum(counts) - counts, values
+
+    def expand(self, start=0, stop=None, dtype=np.uint8):
+        """Materialize samples in [start, stop).
+
+        Parameters
+        ----------
+            start : int
+            stop : int
+                Defaults to the end of the sequence.
+            dtype : numpy.dtype
+
+        Returns
+        -------
+            timing_wave : numpy.ndarray
+                1D NumPy array containing samples in [start, stop).
+        """
+        n_samples = self.n_samples
+        stop = n_samples if stop is None else min(stop, n_samples)
+        start = max(start, 0)
+        if start >= stop:
+            return np.empty(0, dtype=dtype)
+        first, counts = _segment_range(self.ends, self.counts, start, stop)
+        return np.repeat(self.values[first:first + len(counts)].astype(dtype), counts)
+
+
+def _segment_range(ends, counts, start, stop, first=0):
+    """Locate the segments covering samples [start, stop).
+
+    `first` is a cursor, the search for the first segment starts from it.
+    Returns the index of the first covered segment and the number of samples
+    each covered segment contributes.
+    """
+    # first segment containing sample `start` and last containing `stop - 1`
+    first = first + np.searchsorted(ends[first:], start, side='right')
+    last = first + np.searchsorted(ends[first:], stop, side='left')
+    counts = counts[first:last + 1].copy()
+    counts[0] -= start - (ends[first] - counts[0])
+    counts[-1] -= ends[last] - stop
+    return first, counts
+
+
+def pulse(value, duration):
+    """Segment holding `value` for `duration` seconds."""
+    return (value, duration)
+
+
+def wait(duration, value=0):
+    """Segment holding `value`, all bits low by default, for `duration` seconds."""
+    return (value, duration)
+
+
+class Repeat:
+    """Block of segments repeated `n` times.
+
+    Parameters
+    ----------
+        n : int
+        body : list
+            Segments, `Repeat` blocks or nested lists of them.
+    """
+
+    def __init__(self, n, body):
+        if n < 0:
+            raise ValueError('repeat count must not be negative')
+        self.n = n
+        self.body = list(body)
+
+    def __repr__(self):
+        return '{}({}, {!r})'.format(type(self).__name__, self.n, self.body)
+
+
+class SequenceBuilder:
+    """Build timing sequence with nested loops.
+
+    Examples
+    --------
+        seq = SequenceBuilder()
+        seq.pulse(0xFF, 1e-3)
+        seq.repeat(1000, [pulse(0x01, 2e-6), wait(5e-6)])
+        timing_sequence = seq.compile(sample_rate=5e6)
+
+    Loops are not unrolled in Python, compiling costs Python work proportional
+    to the number of items written and vectorized NumPy work for the repeats.
+    """
+
+    def __init__(self, items=None):
+        self.items = [] if items is None else list(items)
+
+    def pulse(self, value, duration):
+        self.items.append(pulse(value, duration))
+        return self
+
+    def wait(self, duration, value=0):
+        self.items.append(wait(duration, value))
+        return self
+
+    def repeat(self, n, body):
+        self.items.append(Repeat(n, body))
+        return self
+
+    def compile(self, sample_rate):
+        """Compile to `TimingSequence`.
+
+        Adjacent segments with equal values are merged and zero-length segments dropped.
+        """
+        values, counts = _compile_items(self.items, sample_rate)
+        values, counts = _merge_segments(values, counts)
+        return TimingSequence(values, counts, sample_rate)
+
+
+def _compile_items(items, sample_rate):
+    """Compile segments and `Repeat` blocks to value and count arrays."""
+    parts = []
+    segments = []
+
+    def flush():
+        if segments:
+            parts.append(TimingSequence.from_list(segments, sample_rate))
+            segments.clear()
+
+    for item in items:
+        if isinstance(item, Repeat):
+            flush()
+            values, counts = _merge_segments(*_compile_items(item.body, sample_rate))
+            parts.append(TimingSequence(np.tile(values, item.n), np.tile(counts, item.n)))
+        elif isinstance(item, list):
+            flush()
+            parts.append(TimingSequence(*_compile_items(item, sample_rate)))
+        else:
+            segments.append(item)
+    flush()
+    if not parts:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    return (np.concatenate([part.values for part in parts]),
+            np.concatenate([part.counts for part in parts]))
+
+
+def _merge_segments(values, counts):
+    """Drop zero-length segments and merge adjacent segments with equal values."""
+    nonzero = counts > 0
+    values, counts = values[nonzero], counts[nonzero]
+    if len(values) == 0:
+        return values, counts
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    return values[starts], np.add.reduceat(counts, starts)
+
+
+def _as_timing_sequence(timing_sequence, sample_rate):
+    """Convert timing sequence list to `TimingSequence` at `sample_rate`."""
+    if isinstance(timing_sequence, SequenceBuilder):
+        return timing_sequence.compile(sample_rate)
+    if isinstance(timing_sequence, TimingSequence):
+        if timing_sequence.sample_rate is not None and timing_sequence.sample_rate != sample_rate:
+            raise ValueError('timing sequence was built for sample rate {}, got {}'.format(
+                timing_sequence.sample_rate, sample_rate))
+        return timing_sequence
+    return TimingSequence.from_list(timing_sequence, sample_rate)
+
+
+def _word_dtype(n_bytes):
+    """Little-endian unsigned dtype wide enough to hold `n_bytes` bytes."""
+    for size in (1, 2, 4, 8):
+        if n_bytes <= size:
+            return np.dtype('<u{}'.format(size))
+    raise ValueError('word of {} bytes is wider than 64 bits'.format(n_bytes))
+
+
+def _port_views(words, port_dtype, n_channel):
+    """Expose each port of little-endian words as one row of a strided view.
+
+    The least significant port is row 0. No data is copied.
+    """
+    n_ports = words.dtype.itemsize // port_dtype.itemsize
+    return words.view(port_dtype).reshape(-1, n_ports)[:, :n_channel].T
+
+
+def generate_timing_wave(timing_sequence_list, sample_rate, bit_num=8, n_channel=1,
+                         out=None, block_samples=2**22):
     """Generate digital wave according to timing sequence.
 
     Parameters
     ----------
-        timing_sequence_list : list
+        timing_sequence_list : list, TimingSequence or SequenceBuilder
         sample_rate : float
         bit_num : int
+            The number of lines of a port, up to 32. Wave dtype is uint8 up to
+            8 lines, uint16 up to 16 and uint32 up to 32.
         n_channel : int
             The number of channel containing in timing wave.
+        out : numpy.ndarray
+            If given, the wave is written into this array, e.g. a `np.memmap`,
+            `block_samples` samples at a time so that peak memory stays bounded.
+            Its shape must be (n_samples,) for single channel or
+            (n_channel, n_samples) for multiple channel, its dtype that of
+            the wave for `bit_num`.
+        block_samples : int
+            Number of samples generated per block when `out` is given.
 
     Returns
     -------
@@ -59,37 +310,575 @@ def generate_timing_wave(timing_sequence_list, sample_rate, bit_num=8, n_channel
             1D NumPy array containing digital wave if the timing wave containing single channel.
             2D Numpy array containing digital wave if the timing wave containing multiple channel,
         each row corresponding to a channel, the littler bit at the more front row.
+        For 8-, 16- and 32-bit ports the rows are strided views of a single buffer of
+        combined words.
     """
-    dtype = np.uint8 if bit_num < 9 else np.uint16
-    if n_channel == 1:
-        timing_wave = np.concatenate(
-            [np.full(round(t[1] * sample_rate), t[0], dtype=dtype) for t in timing_sequence_list]
-        )
-    else:
-        timing_wave_list = []
-        for idx in range(n_channel):
-            timing_wave_single_channel = np.concatenate(
-                [np.full(round(t[1] * sample_rate), (t[0] >> bit_num*idx) & 0xFF, dtype=dtype)
-                 for t in timing_sequence_list]
-            )
-            timing_wave_list.append(timing_wave_single_channel)
-        timing_wave = np.row_stack(timing_wave_list)
+    timing_sequence = _as_timing_sequence(timing_sequence_list, sample_rate)
+    if out is not None:
+        shape = _wave_shape(timing_sequence.n_samples, n_channel)
+        if out.shape != shape:
+            raise ValueError('out has shape {}, expected {}'.format(out.shape, shape))
+        if out.dtype != _wave_dtype(bit_num):
+            raise ValueError('out has dtype {}, expected {}'.format(out.dtype, _wave_dtype(bit_num)))
+        start = 0
+        for block in iter_timing_wave(timing_sequence, sample_rate, block_samples,
+                                      n_channel=n_channel, bit_num=bit_num):
+            out[..., start:start + block.shape[-1]] = block
+            start += block.shape[-1]
+        return out
+    table, finalize = _channel_table(timing_sequence, bit_num, n_channel)
+    return finalize(np.repeat(table, timing_sequence.counts, axis=-1))
+
+
+def open_timing_wave_memmap(filename, timing_sequence_list, sample_rate, bit_num=8, n_channel=1,
+                            block_samples=2**22):
+    """Generate digital wave into a memory-mapped `.npy` file.
+
+    Parameters
+    ----------
+        filename : str
+        timing_sequence_list : list, TimingSequence or SequenceBuilder
+        sample_rate : float
+        bit_num : int
+        n_channel : int
+        block_samples : int
+            Number of samples generated per block.
+
+    Returns
+    -------
+        timing_wave : numpy.memmap
+            Digital wave laid out as in `generate_timing_wave`, reopen it later
+            with `np.load(filename, mmap_mode='r')`.
+    """
+    timing_sequence = _as_timing_sequence(timing_sequence_list, sample_rate)
+    timing_wave = np.lib.format.open_memmap(
+        filename, mode='w+', dtype=_wave_dtype(bit_num),
+        shape=_wave_shape(timing_sequence.n_samples, n_channel))
+    generate_timing_wave(timing_sequence, sample_rate, bit_num=bit_num, n_channel=n_channel,
+                         out=timing_wave, block_samples=block_samples)
+    timing_wave.flush()
     return timing_wave
 
 
-def plot_timing_wave(timing_wave, sample_rate, bit_num=8):
+def wave_to_edges(timing_wave):
+    """Find transitions of digital wave.
+
+    Parameters
+    ----------
+        timing_wave : numpy.ndarray
+            1D NumPy array, or 2D NumPy array with a row per channel in which
+            case a transition of any channel is an edge.
+
+    Returns
+    -------
+        indices : numpy.ndarray
+            Sample index of each edge, the first sample is always an edge.
+        values : numpy.ndarray
+            Value from each edge on, with a column per edge for 2D wave.
+    """
+    if timing_wave.shape[-1] == 0:
+        return np.empty(0, dtype=np.int64), timing_wave[..., :0]
+    changed = timing_wave[..., 1:] != timing_wave[..., :-1]
+    if changed.ndim > 1:
+        changed = np.any(changed, axis=0)
+    indices = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    return indices, timing_wave[..., indices]
+
+
+def edges_to_wave(indices, values, n_samples):
+    """Expand edges from `wave_to_edges` to digital wave of `n_samples` samples."""
+    counts = np.diff(indices, append=n_samples)
+    return np.repeat(values, counts, axis=-1)
+
+
+def edges_to_sequence(indices, values, n_samples, sample_rate=None):
+    """Convert edges from `wave_to_edges` of a 1D wave to `TimingSequence`."""
+    return TimingSequence(values, np.diff(indices, append=n_samples), sample_rate)
+
+
+def _wave_dtype(bit_num):
+    """Unsigned dtype of a port with `bit_num` lines."""
+    if not 0 < bit_num <= 32:
+        raise ValueError('bit_num must be between 1 and 32, got {}'.format(bit_num))
+    return _word_dtype((bit_num + 7) // 8)
+
+
+def _wave_shape(n_samples, n_channel):
+    return (n_samples,) if n_channel == 1 else (n_channel, n_samples)
+
+
+def iter_timing_wave(timing_sequence, sample_rate, chunk_samples, n_channel=1, bit_num=8):
+    """Generate digital wave chunk by chunk.
+
+    Each chunk is expanded directly from the segment table, so the full wave
+    is never built. Concatenating the chunks along the last axis gives the
+    same result as `generate_timing_wave`.
+
+    Parameters
+    ----------
+        timing_sequence : list or TimingSequence
+        sample_rate : float
+        chunk_samples : int
+            Number of samples per chunk, the last chunk may be shorter.
+        n_channel : int
+        bit_num : int
+
+    Yields
+    ------
+        timing_wave : numpy.ndarray
+            Chunk of digital wave, laid out as in `generate_timing_wave`.
+    """
+    if chunk_samples < 1:
+        raise ValueError('chunk_samples must be positive')
+    timing_sequence = _as_timing_sequence(timing_sequence, sample_rate)
+    table, finalize = _channel_table(timing_sequence, bit_num, n_channel)
+    n_samples = timing_sequence.n_samples
+    first = 0
+    for start in range(0, n_samples, chunk_samples):
+        stop = min(start + chunk_samples, n_samples)
+        first, counts = _segment_range(timing_sequence.ends, timing_sequence.counts,
+                                       start, stop, first)
+        yield finalize(np.repeat(table[..., first:first + len(counts)], counts, axis=-1))
+        # the next chunk starts in the last segment of this one at the earliest
+        first += len(counts) - 1
+
+
+class TimingWaveCache:
+    """Cache of generated timing waves.
+
+    Recently used waves are kept in memory up to `max_bytes`. Older waves
+    are spilled to `.npy` files in `cache_dir` and reopened read-only with
+    `np.load(mmap_mode='r')`. Waves are keyed by a hash of the segments,
+    sample rate, bit_num and n_channel.
+
+    Parameters
+    ----------
+        max_bytes : int
+            Memory budget of the in-memory cache.
+        cache_dir : str
+            Directory of the on-disk store, None to drop evicted waves.
+
+    Attributes
+    ----------
+        hits : int
+            Lookups served from memory.
+        disk_hits : int
+            Lookups served from the on-disk store.
+        misses : int
+            Lookups that generated the wave.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._waves = collections.OrderedDict()
+        self._n_bytes = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._waves)
+
+    def generate_timing_wave(self, timing_sequence_list, sample_rate, bit_num=8, n_channel=1):
+        """Cached `generate_timing_wave`.
+
+        The returned wave is shared with the cache and read-only.
+        """
+        timing_sequence = _as_timing_sequence(timing_sequence_list, sample_rate)
+        key = self.key(timing_sequence, sample_rate, bit_num, n_channel)
+        timing_wave = self._waves.get(key)
+        if timing_wave is not None:
+            self._waves.move_to_end(key)
+            self.hits += 1
+            return timing_wave
+        path = self._path(key)
+        if path is not None and os.path.exists(path):
+            self.disk_hits += 1
+            # memory-mapped waves are not held against the memory budget
+            return np.load(path, mmap_mode='r')
+        self.misses += 1
+        timing_wave = generate_timing_wave(timing_sequence, sample_rate,
+                                           bit_num=bit_num, n_channel=n_channel)
+        # read-only like the memory-mapped waves of the on-disk store
+        timing_wave.flags.writeable = False
+        self._insert(key, timing_wave)
+        return timing_wave
+
+    @staticmethod
+    def key(timing_sequence, sample_rate, bit_num=8, n_channel=1):
+        """Stable hash of timing sequence and generation parameters."""
+        digest = hashlib.sha1()
+        digest.update(np.ascontiguousarray(timing_sequence.values, dtype='<u8').tobytes())
+        digest.update(np.ascontiguousarray(timing_sequence.counts, dtype='<i8').tobytes())
+        digest.update(repr((float(sample_rate), bit_num, n_channel)).encode())
+        return digest.hexdigest()
+
+    def clear(self):
+        """Drop in-memory waves, the on-disk store is kept."""
+        self._waves.clear()
+        self._n_bytes = 0
+
+    def _path(self, key):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def _insert(self, key, timing_wave):
+        self._waves[key] = timing_wave
+        self._n_bytes += _buffer_nbytes(timing_wave)
+        while self._n_bytes > self.max_bytes and self._waves:
+            old_key, old_wave = self._waves.popitem(last=False)
+            self._n_bytes -= _buffer_nbytes(old_wave)
+            path = self._path(old_key)
+            if path is not None and not os.path.exists(path):
+                np.save(path, old_wave)
+
+
+def _buffer_nbytes(array):
+    """Size of the buffer holding `array`, a view keeps its whole base alive."""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array.nbytes
+
+
+def find_period(timing_sequence):
+    """Find the shortest block of segments that timing sequence repeats.
+
+    Periods whose first and last segments hold the same value are found too
+    when adjacent repeats were merged into one segment, as in the output of
+    `SequenceBuilder`.
+
+    Parameters
+    ----------
+        timing_sequence : TimingSequence
+
+    Returns
+    -------
+        period : TimingSequence
+            A single period of timing sequence.
+        repeats : int
+            The number of times period repeats, 1 if timing sequence is not periodic.
+    """
+    values, counts = timing_sequence.values, timing_sequence.counts
+    period_segments = _block_period(values, counts)
+    period = (values[:period_segments], counts[:period_segments])
+    repeats = len(counts) // period_segments if len(counts) else 1
+    # look for repeats merged at the period boundaries
+    values, counts = _merge_segments(values, counts)
+    if len(counts) > 2 and values[0] == values[-1]:
+        # completing the interior with a merged boundary segment gives whole periods
+        inner_values = np.append(values[1:-1], values[0])
+        inner_counts = np.append(counts[1:-1], counts[0] + counts[-1])
+        inner_segments = _block_period(inner_values, inner_counts)
+        inner_repeats = len(inner_counts) // inner_segments
+        if inner_repeats > repeats:
+            repeats = inner_repeats
+            period = (np.concatenate(([values[0]], inner_values[:inner_segments - 1], [values[0]])),
+                      np.concatenate(([counts[0]], inner_counts[:inner_segments - 1], [counts[-1]])))
+    return TimingSequence(*period, timing_sequence.sample_rate), repeats
+
+
+def _block_period(values, counts):
+    """Smallest number of segments whose block repeats over the whole table."""
+    n_segments = len(counts)
+    table = np.stack([values.astype(np.int64), counts])
+    for period_segments in range(1, n_segments // 2 + 1):
+        if n_segments % period_segments:
+            continue
+        blocks = table.reshape(2, -1, period_segments)
+        if np.all(blocks == blocks[:, :1]):
+            return period_segments
+    return max(n_segments, 1)
+
+
+def generate_periodic_timing_wave(timing_sequence_list, sample_rate, bit_num=8, n_channel=1,
+                                  repeats=None):
+    """Generate digital wave of a single period of timing sequence.
+
+    Upload the period with `write_digital_data` to a task created by
+    `cfg_DO_task(n_samples=timing_wave.shape[-1] * repeats, buffer_length=timing_wave.shape[-1])`
+    to let the device regenerate it.
+
+    Parameters
+    ----------
+        timing_sequence_list : list or TimingSequence
+        sample_rate : float
+        bit_num : int
+        n_channel : int
+        repeats : int
+            If given, timing sequence is a single period to repeat `repeats`
+            times, otherwise the period is detected by `find_period`.
+
+    Returns
+    -------
+        timing_wave : numpy.ndarray
+            Digital wave of a single period, laid out as in `generate_timing_wave`.
+        repeats : int
+    """
+    timing_sequence = _as_timing_sequence(timing_sequence_list, sample_rate)
+    if repeats is None:
+        timing_sequence, repeats = find_period(timing_sequence)
+    timing_wave = generate_timing_wave(timing_sequence, sample_rate,
+                                       bit_num=bit_num, n_channel=n_channel)
+    return timing_wave, repeats
+
+
+def find_sample_clock_rate(timing_sequence_list, timebase=80e6, divisors=None,
+                           max_divisor=2**32 - 1, tolerance=1e-9):
+    """Find the lowest sample clock rate that represents every edge of timing sequence.
+
+    The sample clock is derived from `timebase` by an integer divisor, so the
+    candidate rates are `timebase / divisor`.
+
+    Parameters
+    ----------
+        timing_sequence_list : list
+        timebase : float
+            Frequency of the timebase the device divides down, e.g. 80 MHz for
+            the cDAQ chassis onboard clock.
+        divisors : iterable of int
+            Divisors the device allows. If None, every divisor up to
+            `max_divisor` is allowed.
+        max_divisor : int
+            Largest divisor used when `divisors` is None.
+        tolerance : float
+            Largest allowed error of an edge, in seconds. Below half a
+            timebase period edges must fall on the timebase ticks exactly.
+            Otherwise, when `divisors` is None, larger divisors fitting
+            within tolerance are searched among a bounded number of
+            candidates, see `_largest_divisor_within`.
+
+    Returns
+    -------
+        rate : float
+            Sample clock rate in Hz.
+    """
+    edges = _sequence_edges(timing_sequence_list)
+    ticks = np.round(edges * timebase)
+    if np.any(np.abs(ticks / timebase - edges) > tolerance):
+        raise ValueError('timing sequence edges are not multiples of the timebase period')
+    edge_ticks = edges * timebase
+    tolerance_ticks = tolerance * timebase
+    if divisors is None:
+        # the gcd of the snapped ticks always fits, search larger divisors from it
+        lower = _largest_factor(int(np.gcd.reduce(ticks.astype(np.int64))), max_divisor)
+        if tolerance_ticks < 0.5:
+            # a fitting divisor puts every edge on its snapped tick, so it divides the gcd
+            divisor = lower
+        else:
+            divisor = _largest_divisor_within(edge_ticks, tolerance_ticks, lower, max_divisor)
+    else:
+        divisors = np.array(sorted(divisors, reverse=True), dtype=np.float64)
+        fits = np.flatnonzero(_divisors_within(edge_ticks, tolerance_ticks, divisors))
+        if len(fits) == 0:
+            raise ValueError('no allowed divisor represents the timing sequence within tolerance')
+        divisor = divisors[fits[0]]
+    return timebase / divisor
+
+
+def plan_timing_sequence(timing_sequence_list, timebase=80e6, divisors=None,
+                         max_divisor=2**32 - 1, tolerance=1e-9):
+    """Convert timing sequence list to `TimingSequence` at the lowest exact sample clock rate.
+
+    See `find_sample_clock_rate` for the parameters. Segment durations are
+    taken between rounded edges, so rounding errors do not accumulate.
+    """
+    rate = find_sample_clock_rate(timing_sequence_list, timebase, divisors, max_divisor, tolerance)
+    ends = np.round(_sequence_edges(timing_sequence_list) * rate).astype(np.int64)
+    counts = np.diff(ends, prepend=0)
+    values = [t[0] for t in timing_sequence_list]
+    return TimingSequence(values, counts, rate)
+
+
+def plan_timing_wave(timing_sequence_list, timebase=80e6, divisors=None, max_divisor=2**32 - 1,
+                     tolerance=1e-9, bit_num=8, n_channel=1):
+    """Generate digital wave at the lowest exact sample clock rate.
+
+    See `find_sample_clock_rate` and `generate_timing_wave` for the parameters.
+
+    Returns
+    -------
+        timing_wave : numpy.ndarray
+        rate : float
+            Sample clock rate of timing wave, to be passed to `cfg_DO_task`.
+    """
+    timing_sequence = plan_timing_sequence(timing_sequence_list, timebase, divisors,
+                                           max_divisor, tolerance)
+    timing_wave = generate_timing_wave(timing_sequence, timing_sequence.sample_rate,
+                                       bit_num=bit_num, n_channel=n_channel)
+    return timing_wave, timing_sequence.sample_rate
+
+
+def _sequence_edges(timing_sequence_list):
+    """End time of each segment in seconds."""
+    edges = np.cumsum([t[1] for t in timing_sequence_list], dtype=np.float64)
+    if len(edges) == 0 or edges[-1] <= 0:
+        raise ValueError('timing sequence is empty')
+    return edges
+
+
+def _divisors_within(edge_ticks, tolerance_ticks, divisors):
+    """Whether each divisor puts every edge within tolerance of a multiple of it."""
+    fits = np.empty(len(divisors), dtype=bool)
+    # bound the size of the divisors x edges temporaries
+    n_rows = max(1, 2**22 // len(edge_ticks))
+    for start in range(0, len(divisors), n_rows):
+        d = divisors[start:start + n_rows, np.newaxis]
+        errors = np.abs(np.round(edge_ticks / d) * d - edge_ticks)
+        fits[start:start + n_rows] = np.all(errors <= tolerance_ticks, axis=1)
+    return fits
+
+
+def _largest_divisor_within(edge_ticks, tolerance_ticks, lower, limit, batch=4096,
+                            max_batches=256):
+    """Largest divisor in [lower, limit] putting every edge within tolerance of a multiple of it.
+
+    `lower` must fit. A fitting divisor d puts the first edge within tolerance
+    of m * d for some m, so candidates are taken from the intervals
+    [(first - tolerance) / m, (first + tolerance) / m], for m increasing.
+    The search stops after `max_batches` batches of `batch` values of m,
+    returning the largest divisor found so far.
+    """
+    first = edge_ticks[edge_ticks > tolerance_ticks]
+    if len(first) == 0:
+        return lower
+    first = first[0]
+    best = lower
+    m = max(1, int(np.ceil((first - tolerance_ticks) / limit)))
+    for _ in range(max_batches):
+        ms = np.arange(m, m + batch, dtype=np.float64)
+        highs = np.minimum(np.floor((first + tolerance_ticks) / ms), limit)
+        if highs[0] <= best:
+            return best
+        lows = np.maximum(np.ceil((first - tolerance_ticks) / ms), best + 1)
+        counts = np.maximum(highs - lows + 1, 0).astype(np.int64)
+        # every integer of each interval
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = np.unique(np.repeat(highs, counts) - offsets)[::-1]
+        fits = np.flatnonzero(_divisors_within(edge_ticks, tolerance_ticks, candidates))
+        if len(fits):
+            best = int(candidates[fits[0]])
+        m += batch
+    return best
+
+
+def _largest_factor(n, limit):
+    """Largest factor of `n` not greater than `limit`."""
+    if n <= limit:
+        return n
+    factor = 1
+    for i in range(1, int(np.sqrt(n)) + 1):
+        if n % i == 0:
+            if n // i <= limit:
+                return n // i
+            factor = i
+    return factor
+
+
+def _channel_table(timing_sequence, bit_num, n_channel):
+    """Prepare per-segment values for expansion.
+
+    Returns the table to expand along its last axis and a function turning
+    the expanded table into the timing wave layout.
+    """
+    dtype = _wave_dtype(bit_num)
+    mask = np.uint64((1 << bit_num) - 1)
+    if n_channel == 1:
+        return (timing_sequence.values & mask).astype(dtype), _identity
+    if bit_num == 8 * dtype.itemsize and bit_num * n_channel <= 64:
+        # ports fill whole bytes, so each port is a view into the combined word
+        words = timing_sequence.values.astype(_word_dtype(bit_num * n_channel // 8))
+        return words, lambda wave: _port_views(wave, dtype, n_channel)
+    # split channels on the segment table, then expand all rows in one pass
+    shifts = np.arange(n_channel, dtype=np.uint64) * np.uint64(bit_num)
+    channel_values = (timing_sequence.values >> shifts[:, np.newaxis]) & mask
+    return channel_values.astype(dtype), _identity
+
+
+def _identity(wave):
+    return wave
+
+
+def unpack_bits(digital_wave, bit_num=None):
+    """Unpack digital wave into one row of booleans per bit in a single pass.
+
+    Parameters
+    ----------
+        digital_wave : numpy.ndarray
+            Unsigned integer array with samples along the last axis.
+        bit_num : int
+            The number of bits to keep, all bits of the dtype by default.
+
+    Returns
+    -------
+        bits : numpy.ndarray
+            Boolean array of shape (..., bit_num, n_samples), the least bit at row 0.
+    """
+    digital_wave = np.asarray(digital_wave)
+    n_bytes = digital_wave.dtype.itemsize
+    if bit_num is None:
+        bit_num = 8 * n_bytes
+    words = np.ascontiguousarray(digital_wave, dtype=digital_wave.dtype.newbyteorder('<'))
+    bits = np.unpackbits(words.view(np.uint8).reshape(*digital_wave.shape, n_bytes),
+                         axis=-1, bitorder='little')
+    return np.swapaxes(bits[..., :bit_num], -1, -2).view(bool)
+
+
+def plot_timing_wave(timing_wave, sample_rate, bit_num=8, n_channel=1):
     """Plot timing wave.
 
+    Every bit of every channel is drawn on a shared time axis by a single
+    `LineCollection`. Only the edges of each bit are drawn, so drawing cost
+    scales with the number of edges instead of the number of samples.
+
     Parameters
     ----------
-        timing_wave : array
+        timing_wave : array or TimingSequence
+            1D or 2D digital wave as returned by `generate_timing_wave`.
         sample_rate : float
         bit_num : int
+        n_channel : int
+            The number of channel containing in timing wave, only used for
+            TimingSequence, the channels of an array are its rows.
     """
-    t = np.linspace(0, len(timing_wave) / sample_rate, len(timing_wave))
-    fig, axs = plt.subplots(bit_num)
-    for idx, ax in enumerate(axs):
-        # plot the least bit first
-        ax.plot(t, np.bitwise_and(np.right_shift(timing_wave, idx), 1))
-        ax.set_ylabel('Bit {}'.format(idx))
+    # matplotlib is only needed for plotting, keep importing this module cheap
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    if isinstance(timing_wave, TimingSequence):
+        indices, values = timing_wave.edges()
+        n_samples = timing_wave.n_samples
+        shifts = np.arange(n_channel, dtype=np.uint64) * np.uint64(bit_num)
+        values = (values >> shifts[:, np.newaxis]) & np.uint64((1 << bit_num) - 1)
+    else:
+        timing_wave = np.asarray(timing_wave)
+        indices, values = wave_to_edges(timing_wave)
+        n_samples = timing_wave.shape[-1]
+        values = np.atleast_2d(values)
+    n_channel = len(values)
+    # one row per line, channel by channel, the least bit first
+    bits = unpack_bits(values, bit_num).reshape(n_channel * bit_num, -1)
+    # edge times followed by the end time
+    t = np.append(indices, n_samples) / sample_rate
+    lines = []
+    for row, bit in enumerate(bits):
+        bit_indices, bit_values = wave_to_edges(bit)
+        # vertices of the step line through this bit's edges
+        x = np.repeat(np.append(t[bit_indices], t[-1]), 2)[1:-1]
+        y = np.repeat(bit_values, 2) * 0.6 + (len(bits) - 1 - row) + 0.2
+        lines.append(np.column_stack((x, y)))
+    if n_channel == 1:
+        labels = ['Bit {}'.format(idx) for idx in range(bit_num)]
+    else:
+        labels = ['Ch {} bit {}'.format(ch, idx) for ch in range(n_channel) for idx in range(bit_num)]
+    fig, ax = plt.subplots()
+    ax.add_collection(LineCollection(lines))
+    ax.autoscale_view()
+    ax.set_ylim(0, len(bits))
+    ax.set_yticks(np.arange(len(bits))[::-1] + 0.5)
+    ax.set_yticklabels(labels)
+    ax.set_xlabel('Time (s)')
     plt.show()